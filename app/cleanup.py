@@ -4,13 +4,62 @@ Automatic cleanup routine for old files and jobs.
 import os
 import time
 import threading
-from pathlib import Path
-from app.queue import get_all_jobs, delete_job
-from app.utils import log_info, log_warning
+from typing import List
+from app.queue import get_expired_jobs, delete_job
+from app.utils import log_info, log_warning, sweep_rate_limits
 
-CLEANUP_INTERVAL = 300  # 5 minutes
+DEFAULT_CLEANUP_INTERVAL = 300  # 5 minutes
+
+
+def _read_cleanup_interval() -> int:
+    """
+    Read CLEANUP_INTERVAL from the environment.
+    
+    Falls back to DEFAULT_CLEANUP_INTERVAL if the value is not a positive integer.
+    """
+    value = os.environ.get("CLEANUP_INTERVAL")
+    if value is None:
+        return DEFAULT_CLEANUP_INTERVAL
+    try:
+        interval = int(value)
+    except ValueError:
+        interval = 0
+    if interval <= 0:
+        log_warning(
+            "Invalid CLEANUP_INTERVAL %r, using %s seconds",
+            value, DEFAULT_CLEANUP_INTERVAL
+        )
+        return DEFAULT_CLEANUP_INTERVAL
+    return interval
+
+
+CLEANUP_INTERVAL = _read_cleanup_interval()
 MAX_FILE_AGE = 600  # 10 minutes
-DOWNLOADS_DIR = Path(__file__).parent / "downloads"
+DOWNLOADS_DIR = os.path.join(os.path.dirname(__file__), "downloads")
+
+# Set to wake the cleanup thread and make it exit
+_stop_event = threading.Event()
+
+
+def _delete_files(paths: List[str], description: str):
+    """
+    Delete a batch of files, logging each result.
+    
+    Missing files are skipped silently, so callers don't need to stat first.
+    
+    Args:
+        paths: File paths to delete
+        description: Label used in log messages (e.g. "old file")
+    """
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            os.unlink(path)
+            log_info("Deleted %s: %s", description, name)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log_warning("Failed to delete %s %s: %s", description, name, e)
 
 
 def cleanup_old_files():
@@ -18,54 +67,56 @@ def cleanup_old_files():
     Remove files and jobs older than MAX_FILE_AGE.
     This function runs periodically in a background thread.
     """
-    while True:
+    while not _stop_event.is_set():
         try:
             log_info("Starting cleanup routine...")
             current_time = time.time()
             
-            # Get all jobs
-            all_jobs = get_all_jobs()
+            cutoff = current_time - MAX_FILE_AGE
             
-            for job_id, job_data in list(all_jobs.items()):
-                created_at = job_data.get('created_at', current_time)
-                age = current_time - created_at
-                
-                # If job is older than MAX_FILE_AGE
-                if age > MAX_FILE_AGE:
-                    # Delete associated file if it exists
-                    filename = job_data.get('filename')
-                    if filename:
-                        file_path = DOWNLOADS_DIR / filename
-                        if file_path.exists():
+            # Scan downloads directory once (filename -> (mtime, path))
+            disk_files = {}
+            if os.path.isdir(DOWNLOADS_DIR):
+                with os.scandir(DOWNLOADS_DIR) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False):
+                            # Files can vanish mid-scan (e.g. yt-dlp renaming .part files)
                             try:
-                                file_path.unlink()
-                                log_info(f"Deleted old file: {filename}")
-                            except Exception as e:
-                                log_warning(f"Failed to delete file {filename}: {e}")
-                    
-                    # Delete job metadata
-                    delete_job(job_id)
-                    log_info(f"Removed old job: {job_id}")
+                                mtime = entry.stat().st_mtime
+                            except OSError:
+                                continue
+                            disk_files[entry.name] = (mtime, entry.path)
             
-            # Also check for orphaned files in downloads directory
-            if DOWNLOADS_DIR.exists():
-                for file_path in DOWNLOADS_DIR.iterdir():
-                    if file_path.is_file():
-                        file_age = current_time - file_path.stat().st_mtime
-                        if file_age > MAX_FILE_AGE:
-                            try:
-                                file_path.unlink()
-                                log_info(f"Deleted orphaned file: {file_path.name}")
-                            except Exception as e:
-                                log_warning(f"Failed to delete orphaned file {file_path.name}: {e}")
+            # Remove expired jobs, collecting their files for deletion
+            expired_files = []
+            for job_id, filename in get_expired_jobs(cutoff):
+                if filename and filename in disk_files:
+                    expired_files.append(disk_files.pop(filename)[1])
+                
+                # Delete job metadata
+                delete_job(job_id)
+                log_info("Removed old job: %s", job_id)
+            
+            _delete_files(expired_files, "old file")
+            
+            # Also remove orphaned files left in downloads directory
+            orphaned_files = [
+                path for mtime, path in disk_files.values()
+                if mtime < cutoff
+            ]
+            _delete_files(orphaned_files, "orphaned file")
             
-            log_info(f"Cleanup complete. Next cleanup in {CLEANUP_INTERVAL} seconds.")
+            # Forget rate limit state for idle IPs
+            sweep_rate_limits()
+            
+            log_info("Cleanup complete. Next cleanup in %s seconds.", CLEANUP_INTERVAL)
             
         except Exception as e:
-            log_warning(f"Error during cleanup: {e}")
+            log_warning("Error during cleanup: %s", e)
         
-        # Wait for next cleanup cycle
-        time.sleep(CLEANUP_INTERVAL)
+        # Wait for next cleanup cycle (returns early on shutdown)
+        if _stop_event.wait(CLEANUP_INTERVAL):
+            break
 
 
 def start_cleanup_thread():
@@ -75,3 +126,11 @@ def start_cleanup_thread():
     cleanup_thread = threading.Thread(target=cleanup_old_files, daemon=True)
     cleanup_thread.start()
     log_info("Cleanup thread started")
+
+
+def stop_cleanup_thread():
+    """
+    Signal the cleanup thread to stop.
+    """
+    _stop_event.set()
+    log_info("Stopping cleanup thread")
@@ -1,16 +1,25 @@
 """
 FastAPI main application with all API endpoints.
 """
+import os
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse
+from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from pathlib import Path
+from typing import Literal
 from app.queue import create_job, get_job_status
 from app.worker import download_video
 from app.utils import is_valid_youtube_url, check_rate_limit, log_info, log_error
-from app.cleanup import start_cleanup_thread
+from app.cleanup import start_cleanup_thread, stop_cleanup_thread
+
+# Hand file delivery off to a reverse proxy (nginx X-Accel-Redirect) when enabled
+USE_X_ACCEL = os.environ.get("USE_X_ACCEL", "").lower() in ("1", "true", "yes")
+X_ACCEL_PREFIX = os.environ.get("X_ACCEL_PREFIX", "/internal_downloads/")
+
+# Kept as a plain string so /result can build paths without pathlib overhead
+DOWNLOADS_DIR = str(Path(__file__).parent / "downloads")
 
 # Initialize FastAPI app with professional metadata
 app = FastAPI(
@@ -61,15 +70,16 @@ static_dir = Path(__file__).parent / "static"
 static_dir.mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
+# Cached contents of docs.html (loaded once at startup)
+_docs_html: bytes | None = None
+
+
 # Serve custom documentation
 @app.get("/docs", include_in_schema=False)
 async def custom_docs():
     """Serve the custom professional documentation page."""
-    docs_path = static_dir / "docs.html"
-    if docs_path.exists():
-        with open(docs_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content)
+    if _docs_html is not None:
+        return HTMLResponse(content=_docs_html)
     else:
         return HTMLResponse(content="<h1>Documentation not found</h1><p>Please ensure docs.html exists in the static directory.</p>", status_code=404)
 
@@ -83,7 +93,14 @@ async def get_openapi():
 # Start cleanup thread on startup
 @app.on_event("startup")
 async def startup_event():
-    """Initialize background threads on application startup."""
+    """Load static content and start background threads on application startup."""
+    global _docs_html
+    
+    # Load documentation page into memory
+    docs_path = static_dir / "docs.html"
+    if docs_path.exists():
+        _docs_html = docs_path.read_bytes()
+    
     # Start cleanup thread
     start_cleanup_thread()
     
@@ -91,15 +108,20 @@ async def startup_event():
     # Jobs are now handled via BackgroundTasks.
     
     log_info("web-dlp API started successfully")
-    
-    log_info("web-dlp API started successfully")
+
+
+# Stop cleanup thread on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background threads on application shutdown."""
+    stop_cleanup_thread()
 
 
 # Pydantic models
 class JobRequest(BaseModel):
     """Request model for creating a download job."""
     url: str = Field(..., description="YouTube video URL")
-    format: str = Field("mp4", description="Output format: 'mp3' (audio) or 'mp4' (video)")
+    format: Literal['mp3', 'mp4'] = Field("mp4", description="Output format: 'mp3' (audio) or 'mp4' (video)")
 
 
 class JobCreateResponse(BaseModel):
@@ -144,7 +166,7 @@ async def create_download_job(job_request: JobRequest, request: Request, backgro
     
     # Check rate limit
     if not check_rate_limit(client_ip):
-        log_error(f"Rate limit exceeded for IP: {client_ip}")
+        log_error("Rate limit exceeded for IP: %s", client_ip)
         raise HTTPException(
             status_code=429,
             detail="Rate limit exceeded. Maximum 5 requests per minute."
@@ -152,19 +174,12 @@ async def create_download_job(job_request: JobRequest, request: Request, backgro
     
     # Validate URL
     if not is_valid_youtube_url(job_request.url):
-        log_error(f"Invalid YouTube URL: {job_request.url}")
+        log_error("Invalid YouTube URL: %s", job_request.url)
         raise HTTPException(
             status_code=400,
             detail="Invalid YouTube URL. Only YouTube URLs are supported."
         )
     
-    # Validate format
-    if job_request.format not in ['mp3', 'mp4']:
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid format. Use 'mp3' or 'mp4'."
-        )
-    
     # Create job
     try:
         job_id = create_job(job_request.url, job_request.format)
@@ -172,12 +187,12 @@ async def create_download_job(job_request: JobRequest, request: Request, backgro
         # Add background task
         background_tasks.add_task(download_video, job_id, job_request.url, job_request.format)
         
-        log_info(f"Created job {job_id} for {job_request.url} ({job_request.format})")
+        log_info("Created job %s for %s (%s)", job_id, job_request.url, job_request.format)
         
         return JobCreateResponse(job_id=job_id, status="queued")
     
     except Exception as e:
-        log_error(f"Failed to create job: {str(e)}")
+        log_error("Failed to create job: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to create download job"
@@ -196,16 +211,16 @@ async def get_status(id: str):
     """
     job_data = get_job_status(id)
     
-    if not job_data:
+    if job_data is None:
         raise HTTPException(
             status_code=404,
             detail="Job not found"
         )
     
     return JobStatusResponse(
-        status=job_data.get('status', 'unknown'),
-        progress=job_data.get('progress', 0),
-        error=job_data.get('error')
+        status=job_data.status,
+        progress=job_data.progress,
+        error=job_data.error
     )
 
 
@@ -221,33 +236,34 @@ async def get_result(id: str):
     """
     job_data = get_job_status(id)
     
-    if not job_data:
+    if job_data is None:
         raise HTTPException(
             status_code=404,
             detail="Job not found"
         )
     
     # Check if job is finished
-    if job_data.get('status') != 'finished':
-        status = job_data.get('status', 'unknown')
+    if job_data.status != 'finished':
         return JSONResponse(
             status_code=400,
-            content={"error": "not_ready", "status": status}
+            content={"error": "not_ready", "status": job_data.status}
         )
     
     # Get file path
-    filename = job_data.get('filename')
+    filename = job_data.filename
     if not filename:
         raise HTTPException(
             status_code=500,
             detail="File not available"
         )
     
-    downloads_dir = Path(__file__).parent / "downloads"
-    file_path = downloads_dir / filename
+    file_path = os.path.join(DOWNLOADS_DIR, filename)
     
-    if not file_path.exists():
-        log_error(f"File not found for job {id}: {filename}")
+    # Stat once here; FileResponse reuses it instead of stat-ing again
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        log_error("File not found for job %s: %s", id, filename)
         raise HTTPException(
             status_code=404,
             detail="File not found"
@@ -256,11 +272,22 @@ async def get_result(id: str):
     # Determine media type
     media_type = "audio/mpeg" if filename.endswith('.mp3') else "video/mp4"
     
-    log_info(f"Serving file for job {id}: {filename}")
+    log_info("Serving file for job %s: %s", id, filename)
+    
+    # Let the reverse proxy stream the file from its internal location
+    if USE_X_ACCEL:
+        return Response(
+            media_type=media_type,
+            headers={
+                "X-Accel-Redirect": f"{X_ACCEL_PREFIX}{filename}",
+                "Content-Disposition": f"attachment; filename={filename}"
+            }
+        )
     
     # Return file
     return FileResponse(
         path=file_path,
+        stat_result=stat_result,
         media_type=media_type,
         filename=filename,
         headers={
@@ -280,7 +307,7 @@ async def not_found_handler(request: Request, exc: HTTPException):
 
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc: Exception):
-    log_error(f"Internal error: {str(exc)}")
+    log_error("Internal error: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error"}
@@ -3,14 +3,31 @@ Queue system for managing download jobs using threading (Windows-compatible).
 """
 import queue
 import threading
-from typing import Dict, Any
-import uuid
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import secrets
 import time
 
-# Thread-safe dictionary
 # job_queue removed for serverless compatibility
-job_statuses: Dict[str, Dict[str, Any]] = {}
-_lock = threading.Lock()
+
+# Thread-safe job store, sharded by job ID so concurrent updates to
+# different jobs rarely contend on the same lock
+_SHARD_COUNT = 16
+_shards: List[Dict[str, Dict[str, Any]]] = [{} for _ in range(_SHARD_COUNT)]
+_locks: List[threading.Lock] = [threading.Lock() for _ in range(_SHARD_COUNT)]
+
+
+class JobView(NamedTuple):
+    """Read-only view of the job fields exposed by the API."""
+    status: str
+    progress: int
+    error: Optional[str]
+    filename: Optional[str]
+
+
+def _get_shard(job_id: str) -> Tuple[Dict[str, Dict[str, Any]], threading.Lock]:
+    """Return the (jobs, lock) shard that owns job_id."""
+    index = hash(job_id) % _SHARD_COUNT
+    return _shards[index], _locks[index]
 
 
 def create_job(url: str, format: str) -> str:
@@ -24,7 +41,7 @@ def create_job(url: str, format: str) -> str:
     Returns:
         job_id: Unique identifier for the job
     """
-    job_id = str(uuid.uuid4())
+    job_id = secrets.token_hex(16)
     
     job_data = {
         'job_id': job_id,
@@ -38,8 +55,9 @@ def create_job(url: str, format: str) -> str:
     }
     
     # Store job status (thread-safe)
-    with _lock:
-        job_statuses[job_id] = job_data
+    jobs, lock = _get_shard(job_id)
+    with lock:
+        jobs[job_id] = job_data
     
     # Queue usage removed for serverless compatibility
     # The job will be processed via FastAPI BackgroundTasks
@@ -47,7 +65,7 @@ def create_job(url: str, format: str) -> str:
     return job_id
 
 
-def get_job_status(job_id: str) -> Dict[str, Any]:
+def get_job_status(job_id: str) -> Optional[JobView]:
     """
     Get the current status of a job.
     
@@ -55,10 +73,19 @@ def get_job_status(job_id: str) -> Dict[str, Any]:
         job_id: Job identifier
     
     Returns:
-        Job status dictionary or None if not found
+        JobView with status, progress, error and filename, or None if not found
     """
-    with _lock:
-        return job_statuses.get(job_id, {}).copy()
+    jobs, lock = _get_shard(job_id)
+    with lock:
+        job_data = jobs.get(job_id)
+        if job_data is None:
+            return None
+        return JobView(
+            job_data['status'],
+            job_data['progress'],
+            job_data['error'],
+            job_data['filename']
+        )
 
 
 def update_job_status(job_id: str, **kwargs):
@@ -69,9 +96,10 @@ def update_job_status(job_id: str, **kwargs):
         job_id: Job identifier
         **kwargs: Fields to update (status, progress, error, filename)
     """
-    with _lock:
-        if job_id in job_statuses:
-            job_statuses[job_id].update(kwargs)
+    jobs, lock = _get_shard(job_id)
+    with lock:
+        if job_id in jobs:
+            jobs[job_id].update(kwargs)
 
 
 def delete_job(job_id: str):
@@ -81,17 +109,27 @@ def delete_job(job_id: str):
     Args:
         job_id: Job identifier
     """
-    with _lock:
-        if job_id in job_statuses:
-            del job_statuses[job_id]
+    jobs, lock = _get_shard(job_id)
+    with lock:
+        jobs.pop(job_id, None)
 
 
-def get_all_jobs() -> Dict[str, Dict[str, Any]]:
+def get_expired_jobs(cutoff: float) -> List[Tuple[str, Optional[str]]]:
     """
-    Get all jobs (used for cleanup).
+    Get jobs created before the cutoff time (used for cleanup).
+    
+    Args:
+        cutoff: Timestamp; jobs created before it are considered expired
     
     Returns:
-        Dictionary of all jobs
+        List of (job_id, filename) tuples for expired jobs
     """
-    with _lock:
-        return job_statuses.copy()
+    expired = []
+    for jobs, lock in zip(_shards, _locks):
+        with lock:
+            expired.extend(
+                (job_id, job_data.get('filename'))
+                for job_id, job_data in jobs.items()
+                if job_data.get('created_at', cutoff) < cutoff
+            )
+    return expired
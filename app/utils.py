@@ -1,25 +1,53 @@
 """
 Utility functions for validation, rate limiting, and logging.
 """
-import re
+import os
 import time
+import threading
+from array import array
 from collections import defaultdict
 from typing import Dict
 import logging
 
-# Configure logging
+# Configure logging (unknown LOG_LEVEL names fall back to INFO)
+_log_level_name = os.environ.get("LOG_LEVEL", "INFO").upper()
+_log_level = logging.getLevelName(_log_level_name)
+_log_level_known = isinstance(_log_level, int)
+if not _log_level_known:
+    _log_level = logging.INFO
+
 logging.basicConfig(
-    level=logging.INFO,
+    level=_log_level,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger('web-dlp')
 
-# Rate limiting storage (IP -> list of timestamps)
-rate_limit_storage: Dict[str, list] = defaultdict(list)
+if not _log_level_known:
+    logger.warning("Unknown LOG_LEVEL %r, using INFO", _log_level_name)
+
 RATE_LIMIT_WINDOW = 60  # 1 minute
 RATE_LIMIT_MAX = 5  # 5 requests per minute
 
 
+class RateLimitRing:
+    """Fixed-size ring of the last RATE_LIMIT_MAX accepted request timestamps."""
+    __slots__ = ('timestamps', 'index')
+    
+    def __init__(self):
+        # Zeroed slots are always outside the window
+        self.timestamps = array('d', [0.0] * RATE_LIMIT_MAX)
+        # Slot holding the oldest timestamp (next one to overwrite)
+        self.index = 0
+
+
+# Rate limiting storage (IP -> ring of recent request timestamps)
+rate_limit_storage: Dict[str, RateLimitRing] = defaultdict(RateLimitRing)
+_rate_limit_lock = threading.Lock()
+
+# Accepted YouTube hosts (covers youtube.com/watch?v=... and youtu.be/... links)
+YOUTUBE_HOSTS = ('youtube.com/', 'm.youtube.com/', 'youtu.be/')
+
+
 def is_valid_youtube_url(url: str) -> bool:
     """
     Validate if the URL is a valid YouTube URL.
@@ -30,15 +58,18 @@ def is_valid_youtube_url(url: str) -> bool:
     Returns:
         True if valid YouTube URL, False otherwise
     """
-    youtube_patterns = [
-        r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+',
-        r'(https?://)?(www\.)?youtube\.com/watch\?v=[\w-]+',
-        r'(https?://)?(www\.)?youtu\.be/[\w-]+'
-    ]
+    # Strip optional scheme and www. prefix
+    if url.startswith('https://'):
+        url = url[8:]
+    elif url.startswith('http://'):
+        url = url[7:]
+    if url.startswith('www.'):
+        url = url[4:]
     
-    for pattern in youtube_patterns:
-        if re.match(pattern, url):
-            return True
+    # Require a known host followed by a non-empty path
+    for host in YOUTUBE_HOSTS:
+        if url.startswith(host):
+            return len(url) > len(host)
     
     return False
 
@@ -54,20 +85,36 @@ def check_rate_limit(ip_address: str) -> bool:
         True if within limits, False if exceeded
     """
     current_time = time.time()
+    cutoff = current_time - RATE_LIMIT_WINDOW
     
-    # Clean old entries
-    rate_limit_storage[ip_address] = [
-        timestamp for timestamp in rate_limit_storage[ip_address]
-        if current_time - timestamp < RATE_LIMIT_WINDOW
-    ]
+    with _rate_limit_lock:
+        ring = rate_limit_storage[ip_address]
+        
+        # Check limit: the oldest of the last RATE_LIMIT_MAX requests
+        # must have left the window
+        if ring.timestamps[ring.index] > cutoff:
+            return False
+        
+        # Add new request, overwriting the oldest slot
+        ring.timestamps[ring.index] = current_time
+        ring.index = (ring.index + 1) % RATE_LIMIT_MAX
+        return True
+
+
+def sweep_rate_limits():
+    """
+    Drop rate limit entries for IPs with no requests inside the window.
     
-    # Check limit
-    if len(rate_limit_storage[ip_address]) >= RATE_LIMIT_MAX:
-        return False
+    Keeps rate_limit_storage bounded when many distinct IPs hit the API.
+    """
+    cutoff = time.time() - RATE_LIMIT_WINDOW
     
-    # Add new request
-    rate_limit_storage[ip_address].append(current_time)
-    return True
+    with _rate_limit_lock:
+        for ip_address in list(rate_limit_storage):
+            ring = rate_limit_storage[ip_address]
+            newest = ring.timestamps[ring.index - 1]
+            if newest <= cutoff:
+                del rate_limit_storage[ip_address]
 
 
 def get_file_age(timestamp: float) -> float:
@@ -83,16 +130,16 @@ def get_file_age(timestamp: float) -> float:
     return time.time() - timestamp
 
 
-def log_info(message: str):
+def log_info(message: str, *args):
     """Log info message."""
-    logger.info(message)
+    logger.info(message, *args)
 
 
-def log_error(message: str):
+def log_error(message: str, *args):
     """Log error message."""
-    logger.error(message)
+    logger.error(message, *args)
 
 
-def log_warning(message: str):
+def log_warning(message: str, *args):
     """Log warning message."""
-    logger.warning(message)
+    logger.warning(message, *args)
@@ -2,15 +2,115 @@
 Background worker process for downloading videos using yt-dlp.
 """
 import os
-import sys
 import time
-import subprocess
-import threading
+import logging
 from pathlib import Path
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import PostProcessor
+from yt_dlp.utils import DownloadCancelled, DownloadError
 from app.queue import update_job_status
 from app.utils import log_info, log_error
 
 DOWNLOADS_DIR = Path(__file__).parent / "downloads"
+YTDLP_LOGGER = logging.getLogger('web-dlp.yt-dlp')
+DOWNLOAD_TIMEOUT = 300  # 5 minutes
+SOCKET_TIMEOUT = 30  # Per network read, so stalled connections fail instead of hanging
+
+# Note on DOWNLOAD_TIMEOUT: unlike the old subprocess timeout, it cannot
+# interrupt yt-dlp at an arbitrary point. It is checked from yt-dlp's
+# hooks, i.e. while download progress is reported and whenever a
+# post-processing step (merge, audio extraction) starts or finishes.
+# Extraction and individual ffmpeg runs are not interrupted; network
+# stalls in any phase are bounded by SOCKET_TIMEOUT instead.
+
+# Base yt-dlp options per output format
+YDL_FORMAT_OPTIONS = {
+    'mp3': {
+        'format': 'bestaudio/best',
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }],
+    },
+    'mp4': {
+        # Every alternative yields an .mp4 file (merged output or a single mp4)
+        'format': 'bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720][ext=mp4]/best[ext=mp4]',
+        'merge_output_format': 'mp4',
+    },
+}
+
+
+class DownloadTimeout(DownloadCancelled):
+    """Raised from a yt-dlp hook when a job runs past its deadline."""
+
+
+def _make_deadline_hook(deadline: float):
+    """
+    Build a yt-dlp postprocessor hook that aborts the job past its deadline.
+    
+    Args:
+        deadline: Timestamp after which the job is cancelled
+    """
+    def hook(d):
+        if time.time() > deadline:
+            raise DownloadTimeout()
+    
+    return hook
+
+
+class _JobProgress(PostProcessor):
+    """
+    Report real download progress for a job.
+    
+    Download progress is mapped onto the 10-90% range; the remainder is
+    reserved for post-processing and finalization. When yt-dlp downloads
+    several files for one job (video + audio before merging), each file
+    gets an equal share of the range so progress never goes backwards.
+    
+    Registered as a 'before_dl' postprocessor to learn how many files
+    will be downloaded, and as a progress hook via on_progress.
+    """
+    
+    def __init__(self, job_id: str, deadline: float):
+        """
+        Args:
+            job_id: Job to update
+            deadline: Timestamp after which the job is cancelled
+        """
+        super().__init__()
+        self.job_id = job_id
+        self.deadline = deadline
+        self.file_count = 1
+        self.files_done = 0
+        self.last_progress = 10
+    
+    def run(self, info):
+        self.file_count = len(info.get('requested_formats') or ()) or 1
+        return [], info
+    
+    def on_progress(self, d):
+        if time.time() > self.deadline:
+            raise DownloadTimeout()
+        
+        status = d.get('status')
+        if status == 'finished':
+            self.files_done = min(self.files_done + 1, self.file_count)
+            fraction = 0.0
+        elif status == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if not total:
+                return
+            fraction = min(d.get('downloaded_bytes', 0) / total, 1.0)
+        else:
+            return
+        
+        done = min((self.files_done + fraction) / self.file_count, 1.0)
+        progress = 10 + int(done * 80)
+        # Only touch the job store when the percentage goes up
+        if progress > self.last_progress:
+            self.last_progress = progress
+            update_job_status(self.job_id, progress=progress)
 
 
 def download_video(job_id: str, url: str, format: str):
@@ -23,66 +123,47 @@ def download_video(job_id: str, url: str, format: str):
         format: Output format (mp3 or mp4)
     """
     try:
-        log_info(f"Starting download for job {job_id}: {url} ({format})")
+        log_info("Starting download for job %s: %s (%s)", job_id, url, format)
         update_job_status(job_id, status='processing', progress=10)
         
         # Ensure downloads directory exists
         DOWNLOADS_DIR.mkdir(exist_ok=True)
         
-        # Determine output filename
-        if format == 'mp3':
-            output_filename = f"{job_id}.mp3"
-            output_path = DOWNLOADS_DIR / output_filename
-            
-            # yt-dlp command for audio extraction
-            cmd = [
-                'yt-dlp',
-                '--extract-audio',
-                '--audio-format', 'mp3',
-                '--audio-quality', '192K',
-                '--output', str(output_path),
-                '--no-playlist',
-                '--quiet',
-                '--no-warnings',
-                url
-            ]
-        else:  # mp4
-            output_filename = f"{job_id}.mp4"
-            output_path = DOWNLOADS_DIR / output_filename
-            
-            # yt-dlp command for video download (720p or best)
-            cmd = [
-                'yt-dlp',
-                '--format', 'bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720][ext=mp4]/best',
-                '--merge-output-format', 'mp4',
-                '--output', str(output_path),
-                '--no-playlist',
-                '--quiet',
-                '--no-warnings',
-                url
-            ]
-        
-        update_job_status(job_id, status='processing', progress=30)
+        # A YoutubeDL instance is not safe to share between concurrent
+        # downloads, so build one per job (still in-process, no spawn)
+        deadline = time.time() + DOWNLOAD_TIMEOUT
+        ydl_opts = {
+            **YDL_FORMAT_OPTIONS[format],
+            'outtmpl': str(DOWNLOADS_DIR / f"{job_id}.%(ext)s"),
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            # quiet only implies noprogress on the CLI, not in the Python API
+            'noprogress': True,
+            # Keep ANSI codes out of error text stored on the job
+            'no_color': True,
+            # Route yt-dlp output through the app logger instead of stdout/stderr
+            'logger': YTDLP_LOGGER,
+            'socket_timeout': SOCKET_TIMEOUT,
+            'postprocessor_hooks': [_make_deadline_hook(deadline)],
+        }
         
         # Execute yt-dlp
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        if result.returncode != 0:
-            error_msg = result.stderr or "Download failed"
-            log_error(f"Job {job_id} failed: {error_msg}")
-            update_job_status(
-                job_id,
-                status='error',
-                error=error_msg,
-                progress=0
-            )
-            return
+        with YoutubeDL(ydl_opts) as ydl:
+            job_progress = _JobProgress(job_id, deadline)
+            ydl.add_post_processor(job_progress, when='before_dl')
+            ydl.add_progress_hook(job_progress.on_progress)
+            info = ydl.extract_info(url)
         
         update_job_status(job_id, status='processing', progress=90)
         
+        # Use the path yt-dlp actually wrote (after merging/post-processing)
+        downloads = (info or {}).get('requested_downloads') or []
+        output_path = downloads[0].get('filepath') if downloads else None
+        
         # Verify file exists
-        if not output_path.exists():
-            log_error(f"Job {job_id}: File not found after download")
+        if not output_path or not os.path.exists(output_path):
+            log_error("Job %s: File not found after download", job_id)
             update_job_status(
                 job_id,
                 status='error',
@@ -92,24 +173,34 @@ def download_video(job_id: str, url: str, format: str):
             return
         
         # Mark as finished
+        output_filename = os.path.basename(output_path)
         update_job_status(
             job_id,
             status='finished',
             progress=100,
             filename=output_filename
         )
-        log_info(f"Job {job_id} completed successfully: {output_filename}")
+        log_info("Job %s completed successfully: %s", job_id, output_filename)
         
-    except subprocess.TimeoutExpired:
-        log_error(f"Job {job_id} timed out")
+    except DownloadTimeout:
+        log_error("Job %s timed out", job_id)
         update_job_status(
             job_id,
             status='error',
             error='Download timeout (5 minutes)',
             progress=0
         )
+    except DownloadError as e:
+        error_msg = str(e) or "Download failed"
+        log_error("Job %s failed: %s", job_id, error_msg)
+        update_job_status(
+            job_id,
+            status='error',
+            error=error_msg,
+            progress=0
+        )
     except Exception as e:
-        log_error(f"Job {job_id} error: {str(e)}")
+        log_error("Job %s error: %s", job_id, e)
         update_job_status(
             job_id,
             status='error',